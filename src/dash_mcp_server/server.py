@@ -1,20 +1,61 @@
 import asyncio
-from typing import Optional
+import bisect
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 import httpx
-import subprocess
-import json
+import orjson
+import time
 from pathlib import Path
 from urllib.parse import urlparse
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp import Context
 from pydantic import BaseModel, Field
 
-mcp = FastMCP("Dash Documentation API")
+# Shared HTTP client so connections to the local Dash API are kept alive across tool calls.
+_client: Optional[httpx.AsyncClient] = None
+
+
+async def _get_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=60),
+        )
+    return _client
+
+
+@asynccontextmanager
+async def _lifespan(server: "FastMCP") -> AsyncIterator[None]:
+    """Close the shared HTTP client when the server shuts down."""
+    global _client
+    try:
+        yield
+    finally:
+        if _client is not None:
+            await _client.aclose()
+            _client = None
+
+
+mcp = FastMCP("Dash Documentation API", lifespan=_lifespan)
 
 # Ports allowed for fetch_documentation_url: API port (from working_api_base_url) and ports seen in load_url from search_documentation.
 _allowed_documentation_ports: set[int] = set()
 _allowed_ports_lock = asyncio.Lock()
 
+# Base URL resolved by working_api_base_url and the time it was resolved, so tool calls can skip re-discovery.
+_cached_base_url: Optional[tuple[str, float]] = None
+_BASE_URL_TTL = 60.0
+# "<base URL>/" of the last resolved API server. Its port stays in the allowlist, so fetch_documentation_url accepts URLs under it without parsing.
+_allowed_prefix: Optional[str] = None
+
+# Written by Dash with the port its API server listens on.
+_STATUS_FILE = Path.home() / "Library" / "Application Support" / "Dash" / ".dash_api_server" / "status.json"
+# (mtime, port) of the last status.json whose port passed a health check, so an unchanged file is neither re-read nor re-probed.
+_status_cache: Optional[tuple[int, int]] = None
+
 
 def _port_from_url(url: str) -> Optional[int]:
     """Return port from URL, or default 80/443 if absent. Returns None if parse fails or host is not localhost."""
@@ -46,9 +87,9 @@ async def check_api_health(ctx: Context, port: int) -> bool:
     """Check if the Dash API server is responding at the given port."""
     base_url = f"http://127.0.0.1:{port}"
     try:
-        with httpx.Client(timeout=5.0) as client:
-            response = client.get(f"{base_url}/health")
-            response.raise_for_status()
+        client = await _get_client()
+        response = await client.get(f"{base_url}/health", timeout=5.0)
+        response.raise_for_status()
         await ctx.debug(f"Successfully connected to Dash API at {base_url}")
         return True
     except Exception as e:
@@ -56,32 +97,60 @@ async def check_api_health(ctx: Context, port: int) -> bool:
         return False
 
 
+async def _run_command(*args: str, timeout: float) -> int:
+    """Run a command without blocking the event loop and return its exit code. Kills it if it exceeds timeout."""
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        return await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+
+
+def _invalidate_base_url() -> None:
+    """Forget the cached base URL and verified port so the next call re-discovers the Dash API server."""
+    global _cached_base_url, _status_cache
+    _cached_base_url = None
+    _status_cache = None
+
+
 async def working_api_base_url(ctx: Context) -> Optional[str]:
-    dash_running = await ensure_dash_running(ctx)
-    if not dash_running:
-        return None
-    
+    global _cached_base_url, _allowed_prefix
+    if _cached_base_url is not None:
+        base_url, resolved_at = _cached_base_url
+        if time.monotonic() - resolved_at < _BASE_URL_TTL:
+            return base_url
+
+    # A responding API server proves Dash is running, so only fall back to pgrep/launching when there is none
     port = await get_dash_api_port(ctx)
+    if port is None:
+        dash_running = await ensure_dash_running(ctx)
+        if not dash_running:
+            return None
+        port = await get_dash_api_port(ctx)
     if port is None:
         # Try to automatically enable the Dash API Server
         await ctx.info("The Dash API Server is not enabled. Attempting to enable it automatically...")
         try:
-            subprocess.run(
-                ["defaults", "write", "com.kapeli.dashdoc", "DHAPIServerEnabled", "YES"],
-                check=True,
-                timeout=10
-            )
-            subprocess.run(
-                ["defaults", "write", "com.kapeli.dash-setapp", "DHAPIServerEnabled", "YES"],
-                check=True,
-                timeout=10
+            # Enable it for both the direct and Setapp builds at once
+            return_codes = await asyncio.gather(
+                _run_command("defaults", "write", "com.kapeli.dashdoc", "DHAPIServerEnabled", "YES", timeout=10),
+                _run_command("defaults", "write", "com.kapeli.dash-setapp", "DHAPIServerEnabled", "YES", timeout=10),
             )
-            # Wait a moment for Dash to pick up the change
-            import time
-            time.sleep(2)
-            
-            # Try to get the port again
+            if any(return_codes):
+                await ctx.error("Failed to enable Dash API Server automatically. Please enable it manually in Dash Settings > Integration")
+                return None
+            # Poll for up to 2 seconds while Dash picks up the change
+            deadline = time.monotonic() + 2
             port = await get_dash_api_port(ctx)
+            while port is None and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+                port = await get_dash_api_port(ctx)
             if port is None:
                 await ctx.error("Failed to enable Dash API Server automatically. Please enable it manually in Dash Settings > Integration")
                 return None
@@ -92,75 +161,86 @@ async def working_api_base_url(ctx: Context) -> Optional[str]:
             return None
     
     await _add_allowed_port(port)
-    return f"http://127.0.0.1:{port}"
+    base_url = f"http://127.0.0.1:{port}"
+    _cached_base_url = (base_url, time.monotonic())
+    _allowed_prefix = base_url + "/"
+    return base_url
+
+
+async def _api_get(ctx: Context, path: str, params: Optional[dict] = None) -> Optional[httpx.Response]:
+    """GET a Dash API path. Returns None if the API server could not be reached.
+    If the cached base URL stops answering (e.g. Dash was restarted on another port), it is re-resolved once."""
+    base_url = await working_api_base_url(ctx)
+    if base_url is None:
+        return None
+    client = await _get_client()
+    try:
+        response = await client.get(f"{base_url}{path}", params=params)
+    except httpx.ConnectError:
+        _invalidate_base_url()
+        base_url = await working_api_base_url(ctx)
+        if base_url is None:
+            return None
+        response = await client.get(f"{base_url}{path}", params=params)
+    response.raise_for_status()
+    return response
 
 
 async def get_dash_api_port(ctx: Context) -> Optional[int]:
-    """Get the Dash API port from the status.json file and verify the API server is responding."""
-    status_file = Path.home() / "Library" / "Application Support" / "Dash" / ".dash_api_server" / "status.json"
-    
+    """Get the Dash API port from the status.json file and verify the API server is responding.
+    A port already verified for the unchanged file is returned without another health check; failed API requests clear it."""
+    global _status_cache
     try:
-        with open(status_file, 'r') as f:
-            status_data = json.load(f)
-            port = status_data.get('port')
-            if port is None:
-                return None
-                
+        mtime = _STATUS_FILE.stat().st_mtime_ns
+        if _status_cache is not None and _status_cache[0] == mtime:
+            return _status_cache[1]
+
+        status_data = orjson.loads(_STATUS_FILE.read_bytes())
+        port = status_data.get('port')
+        if port is None:
+            return None
+
         # Check if the API server is actually responding
         if await check_api_health(ctx, port):
+            _status_cache = (mtime, port)
             return port
         else:
             return None
             
-    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+    except (FileNotFoundError, orjson.JSONDecodeError, KeyError):
         return None
 
 
-def check_dash_running() -> bool:
+async def check_dash_running() -> bool:
     """Check if Dash app is running by looking for the process."""
     try:
         # Use pgrep to check for Dash process
-        result = subprocess.run(
-            ["pgrep", "-f", "Dash"],
-            capture_output=True,
-            timeout=5
-        )
-        return result.returncode == 0
+        return await _run_command("pgrep", "-x", "Dash", timeout=5) == 0
     except Exception:
         return False
 
 
 async def ensure_dash_running(ctx: Context) -> bool:
     """Ensure Dash is running, launching it if necessary."""
-    if not check_dash_running():
+    if not await check_dash_running():
         await ctx.info("Dash is not running. Launching Dash...")
         try:
             # Launch Dash using the bundle identifier
-            result = subprocess.run(
-                ["open", "-g", "-j", "-b", "com.kapeli.dashdoc"],
-                timeout=10
-            )
-            if result.returncode != 0:
+            if await _run_command("open", "-g", "-j", "-b", "com.kapeli.dashdoc", timeout=10) != 0:
                 # Try Setapp bundle identifier
-                subprocess.run(
-                    ["open", "-g", "-j", "-b", "com.kapeli.dash-setapp"],
-                    check=True,
-                    timeout=10
-                )
-            # Wait a moment for Dash to start
-            import time
-            time.sleep(4)
-            
-            # Check again if Dash is now running
-            if not check_dash_running():
+                if await _run_command("open", "-g", "-j", "-b", "com.kapeli.dash-setapp", timeout=10) != 0:
+                    await ctx.error("Failed to launch Dash application")
+                    return False
+            # Poll for up to 4 seconds until the API server answers; the process appears well before it listens
+            deadline = time.monotonic() + 4
+            while await get_dash_api_port(ctx) is None and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            if not await check_dash_running():
                 await ctx.error("Failed to launch Dash application")
                 return False
             else:
                 await ctx.info("Dash launched successfully")
                 return True
-        except subprocess.CalledProcessError:
-            await ctx.error("Failed to launch Dash application")
-            return False
         except Exception as e:
             await ctx.error(f"Error launching Dash: {e}")
             return False
@@ -208,18 +288,15 @@ class FetchResult(BaseModel):
     error: Optional[str] = Field(description="Error message if validation or fetch failed", default=None)
 
 
-def estimate_tokens(obj) -> int:
-    """Estimate token count for a serialized object. Rough approximation: 1 token ≈ 4 characters."""
-    if isinstance(obj, str):
-        return max(1, len(obj) // 4)
-    elif isinstance(obj, (list, tuple)):
-        return sum(estimate_tokens(item) for item in obj)
-    elif isinstance(obj, dict):
-        return sum(estimate_tokens(k) + estimate_tokens(v) for k, v in obj.items())
-    elif hasattr(obj, 'model_dump'):  # Pydantic model
-        return estimate_tokens(obj.model_dump())
-    else:
-        return max(1, len(str(obj)) // 4)
+def _estimate_item_tokens(item: dict) -> int:
+    """Estimate token count for a raw API item from its string values. Rough approximation: 1 token ≈ 4 characters, plus 16 for JSON keys."""
+    return sum(len(v) for v in item.values() if isinstance(v, str)) // 4 + 16
+
+
+def _token_budget_cutoff(items: list[dict], token_budget: int) -> int:
+    """Return how many leading items fit within token_budget, located by binary search over the running token total."""
+    cumulative = list(itertools.accumulate(_estimate_item_tokens(item) for item in items))
+    return bisect.bisect_right(cumulative, token_budget)
 
 
 @mcp.tool()
@@ -227,44 +304,33 @@ async def list_installed_docsets(ctx: Context) -> DocsetResults:
     """List all installed documentation sets in Dash. An empty list is returned if the user has no docsets installed. 
     Results are automatically truncated if they would exceed 25,000 tokens."""
     try:
-        base_url = await working_api_base_url(ctx)
-        if base_url is None:
-            return DocsetResults(error="Failed to connect to Dash API Server. Please ensure Dash is running and the API server is enabled (in Dash Settings > Integration).")
         await ctx.debug("Fetching installed docsets from Dash API")
-        
-        with httpx.Client(timeout=30.0) as client:
-            response = client.get(f"{base_url}/docsets/list")
-            response.raise_for_status()
-            result = response.json()
+        response = await _api_get(ctx, "/docsets/list")
+        if response is None:
+            return DocsetResults(error="Failed to connect to Dash API Server. Please ensure Dash is running and the API server is enabled (in Dash Settings > Integration).")
+        result = orjson.loads(response.content)
         
         docsets = result.get("docsets", [])
         await ctx.info(f"Found {len(docsets)} installed docsets")
         
         # Build result list with token limit checking
         token_limit = 25000
-        current_tokens = 100  # Base overhead for response structure
-        limited_docsets = []
-        
-        for docset in docsets:
-            docset_info = DocsetResult(
+        base_tokens = 100  # Base overhead for response structure
+        # Only the docsets that fit are built into models, so items past the limit are never validated
+        count = _token_budget_cutoff(docsets, token_limit - base_tokens)
+        limited_docsets = [
+            DocsetResult(
                 name=docset["name"],
                 identifier=docset["identifier"],
                 platform=docset["platform"],
                 full_text_search=docset["full_text_search"],
                 notice=docset.get("notice")
             )
-            
-            # Estimate tokens for this docset
-            docset_tokens = estimate_tokens(docset_info)
-            
-            if current_tokens + docset_tokens > token_limit:
-                await ctx.warning(f"Token limit reached. Returning {len(limited_docsets)} of {len(docsets)} docsets to stay under 25k token limit.")
-                break
-                
-            limited_docsets.append(docset_info)
-            current_tokens += docset_tokens
+            for docset in docsets[:count]
+        ]
         
         if len(limited_docsets) < len(docsets):
+            await ctx.warning(f"Token limit reached. Returning {len(limited_docsets)} of {len(docsets)} docsets to stay under 25k token limit.")
             await ctx.info(f"Returned {len(limited_docsets)} docsets (truncated from {len(docsets)} due to token limit)")
         
         return DocsetResults(docsets=limited_docsets)
@@ -311,10 +377,6 @@ async def search_documentation(
         return SearchResults(error="max_results must be between 1 and 1000")
     
     try:
-        base_url = await working_api_base_url(ctx)
-        if base_url is None:
-            return SearchResults(error="Failed to connect to Dash API Server. Please ensure Dash is running and the API server is enabled (in Dash Settings > Integration).")
-        
         params = {
             "query": query,
             "docset_identifiers": docset_identifiers,
@@ -324,10 +386,10 @@ async def search_documentation(
         
         await ctx.debug(f"Searching Dash API with query: '{query}'")
         
-        with httpx.Client(timeout=30.0) as client:
-            response = client.get(f"{base_url}/search", params=params)
-            response.raise_for_status()
-            result = response.json()
+        response = await _api_get(ctx, "/search", params=params)
+        if response is None:
+            return SearchResults(error="Failed to connect to Dash API Server. Please ensure Dash is running and the API server is enabled (in Dash Settings > Integration).")
+        result = orjson.loads(response.content)
         
         # Check for warning message in response
         warning_message = None
@@ -335,17 +397,27 @@ async def search_documentation(
             warning_message = result["message"]
             await ctx.warning(warning_message)
         
-        results = result.get("results", [])
-        # Filter out empty dict entries (Dash API returns [{}] for no results)
-        results = [r for r in results if r]
-
-        # Record ports from load_url so fetch_documentation_url can allow them
-        for item in results:
+        # Single pass over the raw results: filter, collect load_url ports and build the running token total
+        results = []
+        cumulative_tokens = []
+        load_url_ports = set()
+        total_tokens = 0
+        for item in result.get("results", []):
+            # Filter out empty dict entries (Dash API returns [{}] for no results)
+            if not item:
+                continue
+            results.append(item)
+            total_tokens += _estimate_item_tokens(item)
+            cumulative_tokens.append(total_tokens)
             load_url = item.get("load_url")
             if load_url:
                 port = _port_from_url(load_url)
                 if port is not None:
-                    await _add_allowed_port(port)
+                    load_url_ports.add(port)
+
+        # Record ports from load_url so fetch_documentation_url can allow them
+        for port in load_url_ports:
+            await _add_allowed_port(port)
 
         if not results and ' ' in query:
             return SearchResults(results=[], error="Nothing found. Try to search for fewer terms.")
@@ -354,11 +426,11 @@ async def search_documentation(
         
         # Build result list with token limit checking
         token_limit = 25000
-        current_tokens = 100  # Base overhead for response structure
-        limited_results = []
-        
-        for item in results:
-            search_result = SearchResult(
+        base_tokens = 100  # Base overhead for response structure
+        # Only the results that fit are built into models, so items past the limit are never validated
+        count = bisect.bisect_right(cumulative_tokens, token_limit - base_tokens)
+        limited_results = [
+            SearchResult(
                 name=item["name"],
                 type=item["type"],
                 platform=item.get("platform"),
@@ -368,18 +440,11 @@ async def search_documentation(
                 language=item.get("language"),
                 tags=item.get("tags")
             )
-            
-            # Estimate tokens for this result
-            result_tokens = estimate_tokens(search_result)
-            
-            if current_tokens + result_tokens > token_limit:
-                await ctx.warning(f"Token limit reached. Returning {len(limited_results)} of {len(results)} results to stay under 25k token limit.")
-                break
-                
-            limited_results.append(search_result)
-            current_tokens += result_tokens
+            for item in results[:count]
+        ]
         
         if len(limited_results) < len(results):
+            await ctx.warning(f"Token limit reached. Returning {len(limited_results)} of {len(results)} results to stay under 25k token limit.")
             await ctx.info(f"Returned {len(limited_results)} results (truncated from {len(results)} due to token limit)")
         
         return SearchResults(results=limited_results, error=warning_message)
@@ -421,25 +486,27 @@ async def fetch_documentation_url(ctx: Context, url: str) -> FetchResult:
         await ctx.error("URL cannot be empty")
         return FetchResult(error="URL cannot be empty")
 
-    port = _port_from_url(url)
-    if port is None:
-        await ctx.error("URL must be http or https and point to localhost (127.0.0.1 or localhost)")
-        return FetchResult(
-            error="URL must be http or https and host must be 127.0.0.1 or localhost."
-        )
+    # URLs under the Dash API base are always allowed; anything else is checked by port
+    if _allowed_prefix is None or not url.startswith(_allowed_prefix):
+        port = _port_from_url(url)
+        if port is None:
+            await ctx.error("URL must be http or https and point to localhost (127.0.0.1 or localhost)")
+            return FetchResult(
+                error="URL must be http or https and host must be 127.0.0.1 or localhost."
+            )
 
-    if not await _is_port_allowed_for_fetch(port):
-        await ctx.error(f"Port {port} is not in the allowlist. Use search_documentation first so load_url ports are recorded.")
-        return FetchResult(
-            error=f"Port {port} is not allowed. Only ports from the Dash API and from load_url values returned by search_documentation are allowed. Run search_documentation first, then use a load_url from its results here."
-        )
+        if not await _is_port_allowed_for_fetch(port):
+            await ctx.error(f"Port {port} is not in the allowlist. Use search_documentation first so load_url ports are recorded.")
+            return FetchResult(
+                error=f"Port {port} is not allowed. Only ports from the Dash API and from load_url values returned by search_documentation are allowed. Run search_documentation first, then use a load_url from its results here."
+            )
 
     try:
         await ctx.debug(f"Fetching documentation URL: {url}")
-        with httpx.Client(timeout=30.0) as client:
-            response = client.get(url)
-            response.raise_for_status()
-            content = response.text
+        client = await _get_client()
+        response = await client.get(url)
+        response.raise_for_status()
+        content = response.text
         await ctx.info("Fetched documentation content successfully")
         return FetchResult(content=content)
     except httpx.HTTPStatusError as e:
@@ -466,16 +533,12 @@ async def enable_docset_fts(ctx: Context, identifier: str) -> bool:
         return False
 
     try:
-        base_url = await working_api_base_url(ctx)
-        if base_url is None:
-            return False
-        
         await ctx.debug(f"Enabling FTS for docset: {identifier}")
         
-        with httpx.Client(timeout=30.0) as client:
-            response = client.get(f"{base_url}/docsets/enable_fts", params={"identifier": identifier})
-            response.raise_for_status()
-            result = response.json()
+        response = await _api_get(ctx, "/docsets/enable_fts", params={"identifier": identifier})
+        if response is None:
+            return False
+        result = orjson.loads(response.content)
         
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 400: